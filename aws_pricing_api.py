@@ -1,6 +1,15 @@
 import os
+import dbm
+import functools
+import pickle
+import shelve
+import threading
+import time
+from types import MappingProxyType
 import boto3
-import json
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+from botocore.config import Config
 from botocore.exceptions import BotoCoreError, ClientError
 from dotenv import load_dotenv
 import logging
@@ -9,37 +18,295 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Region code -> location name used by the Pricing API
+REGION_NAMES = MappingProxyType({
+    'ap-south-1': 'Asia Pacific (Mumbai)',
+    'us-east-1': 'US East (N. Virginia)',
+    # Add more mappings as needed
+})
+
+# Billing periods used to convert between hourly, daily and monthly costs
+HOURS_PER_DAY = 24
+HOURS_PER_MONTH = HOURS_PER_DAY * 30
+
+# Pricing changes rarely, so query results are kept on disk between runs,
+# in the user's cache directory rather than wherever the tool is run from
+PRICING_CACHE_FILE = os.path.join(
+    os.getenv('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+    'aws-cost-estimator',
+    'pricing_cache.db'
+)
+PRICING_CACHE_TTL = 24 * 60 * 60
+EMPTY_RESULT_CACHE_TTL = 60 * 60
+
+# Large enough pool for concurrent lookups; adaptive retries back off on Pricing API throttling
+PRICING_CLIENT_CONFIG = Config(
+    max_pool_connections=50,
+    retries={'mode': 'adaptive', 'max_attempts': 10},
+    tcp_keepalive=True,
+    connect_timeout=3,
+    read_timeout=10
+)
+
+_cache_file_lock = threading.Lock()
+_pricing_client_lock = threading.Lock()
+
+# A missing, corrupt or partially written cache file is treated as empty;
+# dbm.dumb raises SyntaxError/ValueError when its index file is damaged
+_CACHE_FILE_ERRORS = (
+    OSError, *dbm.error, pickle.UnpicklingError, EOFError, SyntaxError, ValueError
+)
+
+# Products fetched when only the first priced one is used; more than one, since
+# get_pricing skips products without an OnDemand price
+PRICE_LOOKUP_PAGE_SIZE = 10
+
+# Stay under the Pricing API's per-account request rate when lookups run concurrently
+PRICING_API_RATE = 8
+
+# Fixed filters per service, built once and shared by every query
+SERVICE_FILTERS = {
+    'AmazonRDS': (
+        {'Type': 'TERM_MATCH', 'Field': 'productFamily', 'Value': 'Database Instance'},
+        {'Type': 'TERM_MATCH', 'Field': 'databaseEngine', 'Value': 'MySQL'},
+        {'Type': 'TERM_MATCH', 'Field': 'deploymentOption', 'Value': 'Single-AZ'}
+    ),
+    'AmazonEBS': (
+        {'Type': 'TERM_MATCH', 'Field': 'volumeType', 'Value': 'General Purpose'},
+        {'Type': 'TERM_MATCH', 'Field': 'productFamily', 'Value': 'Storage'}
+    ),
+    'AWSEFS': (
+        {'Type': 'TERM_MATCH', 'Field': 'productFamily', 'Value': 'Storage'},
+        {'Type': 'TERM_MATCH', 'Field': 'storageClass', 'Value': 'General Purpose'}
+    ),
+    'AmazonEC2': (
+        {'Type': 'TERM_MATCH', 'Field': 'operatingSystem', 'Value': 'Linux'},
+        {'Type': 'TERM_MATCH', 'Field': 'tenancy', 'Value': 'Shared'},
+        {'Type': 'TERM_MATCH', 'Field': 'preInstalledSw', 'Value': 'NA'},
+        {'Type': 'TERM_MATCH', 'Field': 'capacitystatus', 'Value': 'Used'}
+    )
+}
+
+class _RateLimiter:
+    """Token bucket shared by all threads; callers sleep until their slot comes up."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+_rate_limiter = _RateLimiter(PRICING_API_RATE)
+
+def _first_ondemand_usd(product):
+    """Return the first OnDemand USD price of a PriceList product, or None if it has none."""
+    try:
+        # Fast path for the usual terms.OnDemand.<term>.priceDimensions.<dim> shape
+        term = next(iter(product['terms']['OnDemand'].values()))
+        dimension = next(iter(term['priceDimensions'].values()))
+        return dimension['pricePerUnit'].get('USD', 'N/A')
+    except (KeyError, StopIteration):
+        pass
+    
+    return next(
+        (dimension['pricePerUnit'].get('USD', 'N/A')
+         for term in product.get('terms', {}).get('OnDemand', {}).values()
+         for dimension in term.get('priceDimensions', {}).values()
+         if 'pricePerUnit' in dimension),
+        None
+    )
+
+def _is_fresh(entry, now):
+    """Whether a cached (timestamp, price_list) entry is still within its TTL."""
+    timestamp, price_list = entry
+    ttl = PRICING_CACHE_TTL if price_list else EMPTY_RESULT_CACHE_TTL
+    return now - timestamp < ttl
+
+def _validate_service_filters():
+    """
+    Reject SERVICE_FILTERS entries that constrain a field twice, which can never match.
+    get_pricing always adds location and may add instanceType, so those count too.
+    """
+    for service_code, filters in SERVICE_FILTERS.items():
+        fields = ['location', 'instanceType'] + [f['Field'] for f in filters]
+        duplicates = {field for field in fields if fields.count(field) > 1}
+        if duplicates:
+            raise ValueError(f"Duplicate pricing filter fields for {service_code}: {sorted(duplicates)}")
+
+# The table is static, so it is checked once at import instead of on every query
+_validate_service_filters()
+
+@functools.lru_cache(maxsize=None)
+def _create_pricing_client(aws_access_key, aws_secret_key):
+    return boto3.client(
+        'pricing',
+        region_name='us-east-1',  # Pricing API is only available in us-east-1
+        aws_access_key_id=aws_access_key,
+        aws_secret_access_key=aws_secret_key,
+        config=PRICING_CLIENT_CONFIG
+    )
+
+def _get_pricing_client(aws_access_key, aws_secret_key):
+    """Return a process-wide Pricing API client so connections are reused across instances."""
+    # boto3's default session is not thread-safe, and lru_cache alone lets
+    # concurrent misses each build a client, so creation is serialized
+    with _pricing_client_lock:
+        return _create_pricing_client(aws_access_key, aws_secret_key)
+
 class AWSPricingAPI:
-    def __init__(self, region='ap-south-1'):
+    __slots__ = (
+        'aws_access_key', 'aws_secret_key', 'region',
+        '_pricing_client', '_client_lock', 'pricing_cache', 'cache_file',
+        '_cache_file_loaded', 'max_workers'
+    )
+
+    def __init__(self, region='ap-south-1', cache_file=PRICING_CACHE_FILE, max_workers=16):
         """Initialize AWS Pricing API client."""
-        load_dotenv()
+        # Credentials and the client are resolved on the first API call,
+        # so lookups answered from the cache never need them
+        self.aws_access_key = None
+        self.aws_secret_key = None
+        self._pricing_client = None
+        self._client_lock = threading.Lock()
         
-        # Validate AWS credentials
-        self.aws_access_key = os.getenv('AWS_ACCESS_KEY_ID')
-        self.aws_secret_key = os.getenv('AWS_SECRET_ACCESS_KEY')
+        # Convert region code to region name
+        self.region = REGION_NAMES.get(region, region)
         
-        if not self.aws_access_key or not self.aws_secret_key:
-            raise ValueError("AWS credentials not found in environment variables")
+        # repr of (service_code, filters, max_results) -> (timestamp, price_list);
+        # cache_file=None keeps it in memory only
+        self.pricing_cache = {}
+        self.cache_file = cache_file
+        self._cache_file_loaded = False
         
-        # Convert region code to region name
-        self.region_names = {
-            'ap-south-1': 'Asia Pacific (Mumbai)',
-            'us-east-1': 'US East (N. Virginia)',
-            # Add more mappings as needed
-        }
-        self.region = self.region_names.get(region, region)
+        # Number of Pricing API lookups allowed in flight at once
+        self.max_workers = max_workers
+
+    @property
+    def pricing_client(self):
+        """Pricing API client, created on first use."""
+        if self._pricing_client is None:
+            # The first lookups may arrive together from calculate_service_costs' workers
+            with self._client_lock:
+                if self._pricing_client is None:
+                    load_dotenv()
+                    
+                    # Validate AWS credentials
+                    self.aws_access_key = os.getenv('AWS_ACCESS_KEY_ID')
+                    self.aws_secret_key = os.getenv('AWS_SECRET_ACCESS_KEY')
+                    
+                    if not self.aws_access_key or not self.aws_secret_key:
+                        raise ValueError("AWS credentials not found in environment variables")
+                    
+                    self._pricing_client = _get_pricing_client(self.aws_access_key, self.aws_secret_key)
+        return self._pricing_client
+
+    def _get_products(self, service_code, filters, max_results=None):
+        """
+        Return the PriceList for a query, served from cache while it is fresh.
+        Empty results are cached too, but expire sooner.
+        """
+        key = repr((service_code, tuple(sorted((f['Field'], f['Value']) for f in filters)), max_results))
+        
+        if not self._cache_file_loaded:
+            self._load_cache_file()
         
-        self.pricing_client = boto3.client(
-            'pricing',
-            region_name='us-east-1',  # Pricing API is only available in us-east-1
-            aws_access_key_id=self.aws_access_key,
-            aws_secret_access_key=self.aws_secret_key
-        )
-
-    def get_pricing(self, service_code, location, instance_type=None):
+        cached = self.pricing_cache.get(key)
+        if cached is not None and _is_fresh(cached, time.time()):
+            return cached[1]
+        
+        request = {'ServiceCode': service_code, 'Filters': filters}
+        if max_results:
+            # Only fetch as many products as the caller needs
+            request['MaxResults'] = max_results
+        _rate_limiter.acquire()
+        response = self.pricing_client.get_products(**request)
+        entry = (time.time(), response['PriceList'])
+        
+        self.pricing_cache[key] = entry
+        if self.cache_file:
+            self._write_cache_file(key, entry)
+        
+        return entry[1]
+
+    def _load_cache_file(self):
+        """
+        Read this location's fresh entries from the on-disk cache once, so later
+        misses don't reopen it. Expired entries of every location are pruned.
+        """
+        with _cache_file_lock:
+            if self._cache_file_loaded:
+                return
+            if self.cache_file:
+                try:
+                    with shelve.open(self.cache_file, flag='r') as db:
+                        entries = dict(db)
+                except _CACHE_FILE_ERRORS as error:
+                    logger.debug("Not using pricing cache file %s: %s", self.cache_file, error)
+                else:
+                    now = time.time()
+                    fresh = {key: entry for key, entry in entries.items() if _is_fresh(entry, now)}
+                    if len(fresh) < len(entries):
+                        self._rewrite_cache_file(fresh)
+                    for key, entry in fresh.items():
+                        if self._is_own_key(key):
+                            self.pricing_cache.setdefault(key, entry)
+            # Set last, so other threads never see the flag before the entries
+            self._cache_file_loaded = True
+
+    def _rewrite_cache_file(self, entries):
+        """Replace the cache file with only the given entries; called with _cache_file_lock held."""
+        try:
+            # A fresh file rather than deletes, since dbm.dumb never reclaims deleted space
+            with shelve.open(self.cache_file, flag='n') as db:
+                db.update(entries)
+        except _CACHE_FILE_ERRORS as error:
+            logger.debug("Could not prune pricing cache file %s: %s", self.cache_file, error)
+
+    def _write_cache_file(self, key, entry):
+        """Store one query result on disk; failures only cost a lookup on the next run."""
+        try:
+            cache_dir = os.path.dirname(self.cache_file)
+            if cache_dir:
+                os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+            with _cache_file_lock, shelve.open(self.cache_file) as db:
+                db[key] = entry
+        except _CACHE_FILE_ERRORS as error:
+            logger.debug("Could not write pricing cache file %s: %s", self.cache_file, error)
+
+    def _is_own_key(self, key):
+        """Whether a cache key is a query for this instance's location."""
+        return repr(('location', self.region)) in key
+
+    def clear_pricing_cache(self):
+        """
+        Drop this location's cached query results, in memory and on disk,
+        so its next lookups call the API. Other locations' entries are kept.
+        """
+        for key in [key for key in self.pricing_cache if self._is_own_key(key)]:
+            self.pricing_cache.pop(key, None)
+        if self.cache_file:
+            try:
+                with _cache_file_lock, shelve.open(self.cache_file, flag='w') as db:
+                    for key in [key for key in db.keys() if self._is_own_key(key)]:
+                        del db[key]
+            except _CACHE_FILE_ERRORS as error:
+                logger.debug("Could not clear pricing cache file %s: %s", self.cache_file, error)
+
+    def get_pricing(self, service_code, location, instance_type=None, max_results=None):
         """
         Get pricing information for any AWS service.
         Filters by region and optionally by instance type.
+        Set max_results to stop after the first few matching products.
         """
         try:
             # Build filters
@@ -48,89 +315,64 @@ class AWSPricingAPI:
             ]
             
             # Add service-specific filters
-            if service_code == 'AmazonRDS':
-                filters.extend([
-                    {'Type': 'TERM_MATCH', 'Field': 'databaseEngine', 'Value': 'MySQL'},
-                    {'Type': 'TERM_MATCH', 'Field': 'deploymentOption', 'Value': 'Single-AZ'}
-                ])
-                if instance_type:
+            filters.extend(SERVICE_FILTERS.get(service_code, ()))
+            if instance_type:
+                if service_code == 'AmazonRDS':
                     instance_type_value = instance_type if instance_type.startswith('db.') else f'db.{instance_type}'
-                    filters.append({
-                        'Type': 'TERM_MATCH',
-                        'Field': 'usagetype',
-                        'Value': f'APS3-InstanceUsage:{instance_type_value}'
-                    })
-            elif service_code == 'AmazonEBS':
-                filters.extend([
-                    {'Type': 'TERM_MATCH', 'Field': 'volumeType', 'Value': 'General Purpose'},
-                    {'Type': 'TERM_MATCH', 'Field': 'productFamily', 'Value': 'Storage'}
-                ])
-            elif service_code == 'AWSEFS':
-                filters.extend([
-                    {'Type': 'TERM_MATCH', 'Field': 'productFamily', 'Value': 'Storage'},
-                    {'Type': 'TERM_MATCH', 'Field': 'storageClass', 'Value': 'General Purpose'}
-                ])
-            elif service_code == 'AmazonEC2':
-                filters.extend([
-                    {'Type': 'TERM_MATCH', 'Field': 'operatingSystem', 'Value': 'Linux'},
-                    {'Type': 'TERM_MATCH', 'Field': 'tenancy', 'Value': 'Shared'}
-                ])
-                if instance_type:
+                    filters.append({'Type': 'TERM_MATCH', 'Field': 'instanceType', 'Value': instance_type_value})
+                elif service_code == 'AmazonEC2':
                     filters.append({'Type': 'TERM_MATCH', 'Field': 'instanceType', 'Value': instance_type})
             
             # Log the filters being used
-            logger.info(f"Using filters for {service_code}: {filters}")
+            logger.debug("Using filters for %s: %s", service_code, filters)
             
             # Get pricing data with filters
-            response = self.pricing_client.get_products(
-                ServiceCode=service_code,
-                Filters=filters
-            )
+            price_list = self._get_products(service_code, filters, max_results)
             
             pricing_info = []
-            for price_item in response['PriceList']:
-                product = json.loads(price_item)
+            for price_item in price_list:
+                product = orjson.loads(price_item)
                 attributes = product['product']['attributes']
                 
                 # Get price information
-                try:
-                    price_dimensions = list(product['terms']['OnDemand'].values())[0]['priceDimensions']
-                    price_per_unit = list(price_dimensions.values())[0]['pricePerUnit'].get('USD', 'N/A')
-                    
-                    # Convert price to hourly if applicable
-                    if price_per_unit != 'N/A':
-                        if service_code == 'AmazonS3':
-                            price_per_hour = float(price_per_unit) / (30 * 24)
-                        elif service_code == 'AmazonEBS':
-                            price_per_hour = float(price_per_unit) / (30 * 24)  # EBS is billed monthly
-                        else:
-                            price_per_hour = float(price_per_unit)
-                        price_per_hour = f"{price_per_hour:.8f}"
-                    else:
-                        price_per_hour = 'N/A'
-                    
-                    pricing_info.append({
-                        'Service': service_code,
-                        'Instance Type': attributes.get('instanceType', 'N/A'),
-                        'Region': attributes.get('location', 'N/A'),
-                        'Price per Unit (USD)': price_per_unit,
-                        'Price per Hour (USD)': price_per_hour,
-                        'Attributes': attributes
-                    })
-                except (KeyError, IndexError):
+                price_per_unit = _first_ondemand_usd(product)
+                if price_per_unit is None:
                     continue  # Skip if price information is not in expected format
+                
+                # Convert price to hourly if applicable
+                if price_per_unit != 'N/A':
+                    if service_code == 'AmazonS3':
+                        hourly_price = float(price_per_unit) / HOURS_PER_MONTH
+                    elif service_code == 'AmazonEBS':
+                        hourly_price = float(price_per_unit) / HOURS_PER_MONTH  # EBS is billed monthly
+                    else:
+                        hourly_price = float(price_per_unit)
+                    price_per_hour = f"{hourly_price:.8f}"
+                else:
+                    hourly_price = None
+                    price_per_hour = 'N/A'
+                
+                pricing_info.append({
+                    'Service': service_code,
+                    'Instance Type': attributes.get('instanceType', 'N/A'),
+                    'Region': attributes.get('location', 'N/A'),
+                    'Price per Unit (USD)': price_per_unit,
+                    'Price per Hour (USD)': price_per_hour,
+                    'Price per Hour (USD, numeric)': hourly_price,  # float form of the above, None when unpriced
+                    'Attributes': attributes
+                })
             
             return pricing_info
         
         except (BotoCoreError, ClientError) as error:
-            logger.error(f"Error fetching pricing data: {error}")
+            logger.error("Error fetching pricing data: %s", error)
             return []
 
     def calculate_service_cost(self, service_code, instance_type=None):
         """
         Calculate the cost for a service based on its pricing.
         """
-        pricing_info = self.get_pricing(service_code, self.region, instance_type)
+        pricing_info = self.get_pricing(service_code, self.region, instance_type, max_results=PRICE_LOOKUP_PAGE_SIZE)
         if not pricing_info:
             return {
                 'monthly_cost': 0.0,
@@ -141,12 +383,11 @@ class AWSPricingAPI:
         
         # Use the first pricing option
         price_data = pricing_info[0]
-        price_per_hour = float(price_data['Price per Hour (USD)']) if price_data['Price per Hour (USD)'] != 'N/A' else 0.0
         
         # Calculate costs
-        hourly_cost = price_per_hour
-        daily_cost = hourly_cost * 24
-        monthly_cost = daily_cost * 30
+        hourly_cost = price_data['Price per Hour (USD, numeric)'] or 0.0
+        daily_cost = hourly_cost * HOURS_PER_DAY
+        monthly_cost = hourly_cost * HOURS_PER_MONTH
         
         return {
             'monthly_cost': monthly_cost,
@@ -155,6 +396,14 @@ class AWSPricingAPI:
             'details': price_data
         }
 
+    def calculate_service_costs(self, services):
+        """
+        Calculate costs for several (service_code, instance_type) pairs concurrently.
+        Results are returned in the same order as the input.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(lambda service: self.calculate_service_cost(*service), services))
+
     def _log_available_values(self, service_code):
         """Log available values for service attributes for debugging."""
         attributes = [
@@ -174,22 +423,37 @@ class AWSPricingAPI:
                     AttributeName=attr
                 )
                 values = [item['Value'] for item in response['AttributeValues']]
-                logger.info(f"Available {attr} values for {service_code}: {values}")
+                logger.info("Available %s values for %s: %s", attr, service_code, values)
             except Exception as e:
-                logger.debug(f"Could not get {attr} values for {service_code}: {e}")
+                logger.debug("Could not get %s values for %s: %s", attr, service_code, e)
 
     def get_service_specifications(self, service_code, filters=None):
         """
         Get detailed specifications for a service.
         """
-        pricing_info = self.get_pricing(service_code, self.region)
+        pricing_info = self.get_pricing(service_code, self.region, max_results=PRICE_LOOKUP_PAGE_SIZE)
         if not pricing_info:
             return {}
         
-        specs = pricing_info[0]['Attributes']
+        price_data = pricing_info[0]
+        specs = price_data['Attributes']
         specs['pricing'] = {
-            'hourly': pricing_info[0]['Price per Hour (USD)'],
-            'monthly': float(pricing_info[0]['Price per Hour (USD)']) * 24 * 30 if pricing_info[0]['Price per Hour (USD)'] != 'N/A' else 0.0
+            'hourly': price_data['Price per Hour (USD)'],
+            'monthly': (price_data['Price per Hour (USD, numeric)'] or 0.0) * HOURS_PER_MONTH
         }
         
-        return specs 
\ No newline at end of file
+        return specs 
+
+@functools.lru_cache(maxsize=16)
+def _get_shared_api(location):
+    return AWSPricingAPI(location)
+
+def get_shared_api(region='ap-south-1'):
+    """
+    Return a process-wide AWSPricingAPI for a region so its pricing cache is shared.
+    A region code and its location name map to the same instance.
+    Safe to use from several threads: the boto3 client is thread-safe and cache
+    file access is serialized.
+    """
+    # Resolve first and pass positionally, so every spelling of a region hits one cache entry
+    return _get_shared_api(REGION_NAMES.get(region, region))
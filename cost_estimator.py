@@ -1,227 +1,335 @@
-import json
+import orjson
 import logging
-from aws_pricing_api import AWSPricingAPI
+import sys
+import time
+from aws_pricing_api import get_shared_api, HOURS_PER_DAY
 from datetime import datetime
+from types import MappingProxyType
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# How long an estimator reuses a computed service cost before asking the pricing
+# API again; the prices behind it may already be up to PRICING_CACHE_TTL old
+COST_CACHE_TTL = 60 * 60
+
+# Services AWS does not charge for; reported at zero cost without a pricing lookup
+FREE_SERVICES = frozenset({'AmazonVPC', 'AWSIAM', 'AWSCloudFormation'})
+
+# Usage-based services with their pricing components; costs depend on actual usage
+USAGE_BASED_SERVICES = MappingProxyType({
+    'AmazonS3': {
+        'description': 'Storage, requests, and data transfer',
+        'components': (
+            'Storage (per GB per month)',
+            'Data Transfer (per GB)',
+            'Requests (per 1000 requests)',
+            'Lifecycle Transitions'
+        )
+    },
+    'AWSLambda': {
+        'description': 'Compute time and requests',
+        'components': (
+            'Compute (per 100ms)',
+            'Requests (per 1M requests)',
+            'Data Transfer (per GB)'
+        )
+    },
+    'AmazonDynamoDB': {
+        'description': 'Read/write capacity and storage',
+        'components': (
+            'Read Capacity (per RCU)',
+            'Write Capacity (per WCU)',
+            'Storage (per GB per month)',
+            'Data Transfer (per GB)'
+        )
+    },
+    'AmazonSNS': {
+        'description': 'Message delivery and data transfer',
+        'components': (
+            'Message Delivery (per 1M messages)',
+            'Data Transfer (per GB)',
+            'HTTP/HTTPS Delivery'
+        )
+    },
+    'AmazonSQS': {
+        'description': 'Message requests and data transfer',
+        'components': (
+            'Requests (per 1M requests)',
+            'Data Transfer (per GB)'
+        )
+    },
+    'AmazonCloudWatch': {
+        'description': 'Metrics, logs, and alarms',
+        'components': (
+            'Metrics (per metric per month)',
+            'Logs (per GB ingested)',
+            'Alarms (per alarm per month)'
+        )
+    },
+    'AmazonAPIGateway': {
+        'description': 'API calls and data transfer',
+        'components': (
+            'API Calls (per 1M calls)',
+            'Data Transfer (per GB)',
+            'Cache (per GB per hour)'
+        )
+    },
+    'AmazonElastiCache': {
+        'description': 'Cache nodes and data transfer',
+        'components': (
+            'Cache Nodes (per hour)',
+            'Data Transfer (per GB)',
+            'Backup Storage (per GB per month)'
+        )
+    }
+})
+
 class AWSCostEstimator:
+    __slots__ = ('region', 'pricing_api', 'logger', '_cost_cache')
+
     def __init__(self, region='ap-south-1'):
         """Initialize the cost estimator with AWS Pricing API."""
         self.region = region
-        self.pricing_api = AWSPricingAPI(region)
+        self.pricing_api = get_shared_api(region)
         self.logger = logging.getLogger(__name__)
         
-        # Define usage-based services with their pricing components
-        self.usage_based_services = {
-            'AmazonS3': {
-                'description': 'Storage, requests, and data transfer',
-                'components': [
-                    'Storage (per GB per month)',
-                    'Data Transfer (per GB)',
-                    'Requests (per 1000 requests)',
-                    'Lifecycle Transitions'
-                ]
-            },
-            'AWSLambda': {
-                'description': 'Compute time and requests',
-                'components': [
-                    'Compute (per 100ms)',
-                    'Requests (per 1M requests)',
-                    'Data Transfer (per GB)'
-                ]
-            },
-            'AmazonDynamoDB': {
-                'description': 'Read/write capacity and storage',
-                'components': [
-                    'Read Capacity (per RCU)',
-                    'Write Capacity (per WCU)',
-                    'Storage (per GB per month)',
-                    'Data Transfer (per GB)'
-                ]
-            },
-            'AmazonSNS': {
-                'description': 'Message delivery and data transfer',
-                'components': [
-                    'Message Delivery (per 1M messages)',
-                    'Data Transfer (per GB)',
-                    'HTTP/HTTPS Delivery'
-                ]
-            },
-            'AmazonSQS': {
-                'description': 'Message requests and data transfer',
-                'components': [
-                    'Requests (per 1M requests)',
-                    'Data Transfer (per GB)'
-                ]
-            },
-            'AmazonCloudWatch': {
-                'description': 'Metrics, logs, and alarms',
-                'components': [
-                    'Metrics (per metric per month)',
-                    'Logs (per GB ingested)',
-                    'Alarms (per alarm per month)'
-                ]
-            },
-            'AmazonAPIGateway': {
-                'description': 'API calls and data transfer',
-                'components': [
-                    'API Calls (per 1M calls)',
-                    'Data Transfer (per GB)',
-                    'Cache (per GB per hour)'
-                ]
-            },
-            'AmazonElastiCache': {
-                'description': 'Cache nodes and data transfer',
-                'components': [
-                    'Cache Nodes (per hour)',
-                    'Data Transfer (per GB)',
-                    'Backup Storage (per GB per month)'
-                ]
-            }
-        }
+        # (service_type, instance_type) -> (timestamp, cost info), so repeated nodes are priced once
+        self._cost_cache = {}
 
-    def calculate_total_cost(self, architecture_file):
-        """Calculate total cost for an AWS architecture."""
+    def calculate_total_cost(self, architecture_file, print_report=True):
+        """
+        Calculate total cost for an AWS architecture.
+        Returns the report that is saved to cost_report.json, or False on failure.
+        With print_report=False only the JSON report is produced.
+        """
         try:
             # Load architecture from file
-            with open(architecture_file, 'r') as file:
-                architecture = json.load(file)
+            with open(architecture_file, 'rb') as file:
+                architecture = orjson.loads(file.read())
 
             total_hourly_cost = 0.0
             total_monthly_cost = 0.0
             service_details = []
             services_json = {}
 
+            # Look up all priced services concurrently before building the report
+            self._prefetch_service_costs(architecture['nodes'])
+
             # Process each service in the architecture
             for node in architecture['nodes']:
                 service_type = node['type']
                 
                 # Check if it's a usage-based service
-                if service_type in self.usage_based_services:
-                    service_details.append({
-                        'Service': service_type,
-                        'Instance Type': 'N/A',
-                        'Region': self.region,
-                        'Hourly Cost (USD)': '0.00000000',
-                        'Monthly Cost (USD)': '0.00',
-                        'Is Usage Based': True,
-                        'Usage Type': self.usage_based_services[service_type]['description'],
-                        'Components': self.usage_based_services[service_type]['components']
-                    })
+                if service_type in USAGE_BASED_SERVICES:
+                    if print_report:
+                        service_details.append({
+                            'Service': service_type,
+                            'Instance Type': 'N/A',
+                            'Region': self.region,
+                            'Hourly Cost (USD)': '0.00000000',
+                            'Monthly Cost (USD)': '0.00',
+                            'Is Usage Based': True,
+                            'Usage Type': USAGE_BASED_SERVICES[service_type]['description'],
+                            'Components': USAGE_BASED_SERVICES[service_type]['components']
+                        })
                     
                     # Add to JSON structure
                     services_json[service_type] = {
-                        'usage_type': self.usage_based_services[service_type]['description'],
+                        'usage_type': USAGE_BASED_SERVICES[service_type]['description'],
                         'hourly_cost': 0.0,
                         'daily_cost': 0.0,
                         'monthly_cost': 0.0,
                         'specifications': {
-                            'pricing_components': self.usage_based_services[service_type]['components']
+                            'pricing_components': USAGE_BASED_SERVICES[service_type]['components']
                         }
                     }
                     continue
                 
+                # Skip the Pricing API entirely for free services
+                if service_type in FREE_SERVICES:
+                    if print_report:
+                        service_details.append({
+                            'Service': service_type,
+                            'Instance Type': 'N/A',
+                            'Region': self.region,
+                            'Hourly Cost (USD)': '0.00000000',
+                            'Monthly Cost (USD)': '0.00',
+                            'Is Usage Based': False
+                        })
+                    
+                    # Add to JSON structure
+                    services_json[service_type] = {
+                        'instance_type': 'N/A',
+                        'hourly_cost': 0.0,
+                        'daily_cost': 0.0,
+                        'monthly_cost': 0.0,
+                        'specifications': {}
+                    }
+                    continue
+                
                 # Get instance type from node if available
-                instance_type = node.get('InstanceType') or node.get('DBInstanceClass') or node.get('LaunchConfiguration', {}).get('InstanceType')
+                instance_type = self._get_instance_type(node)
                 
                 # Calculate cost for non-usage-based services
-                cost_info = self.pricing_api.calculate_service_cost(service_type, instance_type)
+                cost_info = self._get_service_cost(service_type, instance_type)
                 
-                if cost_info['hourly_cost'] > 0:
-                    total_hourly_cost += cost_info['hourly_cost']
-                    total_monthly_cost += cost_info['monthly_cost']
+                hourly_cost = cost_info['hourly_cost']
+                if hourly_cost > 0:
+                    monthly_cost = cost_info['monthly_cost']
+                    details = cost_info['details']
+                    instance = details.get('Instance Type', 'N/A')
+                    # Copied so callers changing the report can't alter the cached cost info
+                    specifications = dict(details.get('Attributes', {}))
+                    
+                    total_hourly_cost += hourly_cost
+                    total_monthly_cost += monthly_cost
                     
-                    service_details.append({
-                        'Service': service_type,
-                        'Instance Type': cost_info['details'].get('Instance Type', 'N/A'),
-                        'Region': cost_info['details']['Region'],
-                        'Hourly Cost (USD)': f"{cost_info['hourly_cost']:.8f}",
-                        'Monthly Cost (USD)': f"{cost_info['monthly_cost']:.2f}",
-                        'Specifications': cost_info['details'].get('Attributes', {}),
-                        'Is Usage Based': False
-                    })
+                    if print_report:
+                        service_details.append({
+                            'Service': service_type,
+                            'Instance Type': instance,
+                            'Region': details['Region'],
+                            'Hourly Cost (USD)': format(hourly_cost, '.8f'),
+                            'Monthly Cost (USD)': format(monthly_cost, '.2f'),
+                            'Specifications': specifications,
+                            'Is Usage Based': False
+                        })
                     
                     # Add to JSON structure
                     services_json[service_type] = {
-                        'instance_type': cost_info['details'].get('Instance Type', 'N/A'),
-                        'hourly_cost': float(cost_info['hourly_cost']),
-                        'daily_cost': float(cost_info['hourly_cost'] * 24),
-                        'monthly_cost': float(cost_info['monthly_cost']),
-                        'specifications': cost_info['details'].get('Attributes', {})
+                        'instance_type': instance,
+                        'hourly_cost': hourly_cost,
+                        'daily_cost': hourly_cost * HOURS_PER_DAY,
+                        'monthly_cost': monthly_cost,
+                        'specifications': specifications
                     }
                 else:
-                    self.logger.warning(f"No pricing data found for {service_type}")
+                    self.logger.warning("No pricing data found for %s", service_type)
 
             # Create JSON report
             report_json = {
                 'architecture_name': architecture.get('name', 'AWS_Architecture'),
                 'region': self.region,
                 'generation_date': datetime.now().isoformat(),
-                'total_hourly_cost': float(total_hourly_cost),
-                'total_daily_cost': float(total_hourly_cost * 24),
-                'total_monthly_cost': float(total_monthly_cost),
+                'total_hourly_cost': total_hourly_cost,
+                'total_daily_cost': total_hourly_cost * HOURS_PER_DAY,
+                'total_monthly_cost': total_monthly_cost,
                 'services': services_json
             }
 
             # Save JSON report
-            with open('cost_report.json', 'w') as f:
-                json.dump(report_json, f, indent=4)
+            with open('cost_report.json', 'wb') as f:
+                f.write(orjson.dumps(report_json, option=orjson.OPT_INDENT_2))
 
             # Print cost report
-            self._print_cost_report(service_details, total_hourly_cost, total_monthly_cost)
-            return True
+            if print_report:
+                self._print_cost_report(service_details, total_hourly_cost, total_monthly_cost)
+            return report_json
 
         except FileNotFoundError:
-            self.logger.error(f"Architecture file not found: {architecture_file}")
+            self.logger.error("Architecture file not found: %s", architecture_file)
             return False
-        except json.JSONDecodeError:
-            self.logger.error(f"Invalid JSON in architecture file: {architecture_file}")
+        except orjson.JSONDecodeError:
+            self.logger.error("Invalid JSON in architecture file: %s", architecture_file)
             return False
         except Exception as e:
-            self.logger.error(f"Error calculating costs: {e}")
+            self.logger.error("Error calculating costs: %s", e)
             return False
 
+    def _get_instance_type(self, node):
+        """Get the instance type of a node from whichever field its service uses."""
+        instance_type = node.get('InstanceType') or node.get('DBInstanceClass')
+        if not instance_type:
+            launch_configuration = node.get('LaunchConfiguration')
+            instance_type = launch_configuration.get('InstanceType') if launch_configuration else None
+        return instance_type
+
+    def _prefetch_service_costs(self, nodes):
+        """Fill the cost cache for every node that needs a Pricing API lookup, in parallel."""
+        pending = {}
+        for node in nodes:
+            service_type = node['type']
+            if service_type in USAGE_BASED_SERVICES or service_type in FREE_SERVICES:
+                continue
+            key = (service_type, self._get_instance_type(node))
+            if self._get_cached_cost(key) is None:
+                pending[key] = None
+        
+        pending = list(pending)
+        now = time.time()
+        for key, cost_info in zip(pending, self.pricing_api.calculate_service_costs(pending)):
+            self._cost_cache[key] = (now, cost_info)
+
+    def _get_cached_cost(self, key):
+        """Return the cached cost info for a key, or None if it is missing or expired."""
+        cached = self._cost_cache.get(key)
+        if cached is None or time.time() - cached[0] >= COST_CACHE_TTL:
+            return None
+        return cached[1]
+
+    def _get_service_cost(self, service_type, instance_type):
+        """Get the cost of a service, looking up each (service, instance type) pair only once."""
+        key = (service_type, instance_type)
+        cost_info = self._get_cached_cost(key)
+        if cost_info is None:
+            cost_info = self.pricing_api.calculate_service_cost(service_type, instance_type)
+            self._cost_cache[key] = (time.time(), cost_info)
+        return cost_info
+
+    def clear_cost_cache(self):
+        """
+        Forget cached service costs and this region's pricing results behind them,
+        so the next estimate queries the Pricing API again.
+        The pricing cache is shared with every estimator and process using this
+        region; other regions' cached results are kept.
+        """
+        self._cost_cache.clear()
+        self.pricing_api.clear_pricing_cache()
+
     def _print_cost_report(self, service_details, total_hourly_cost, total_monthly_cost):
         """Print a detailed cost report."""
-        print(f"\nCost Report for AWS Architecture")
-        print(f"Region: {self.region}")
-        print("-" * 60)
+        # Collect the report lines and write them to stdout in one call
+        lines = [
+            "\nCost Report for AWS Architecture",
+            f"Region: {self.region}",
+            "-" * 60
+        ]
         
         # Print all services
         if service_details:
-            print("\nServices:")
-            print("-" * 40)
+            lines.append("\nServices:")
+            lines.append("-" * 40)
             for service in service_details:
-                print(f"\n{service['Service']}:")
-                print(f"Region: {service['Region']}")
+                lines.append(f"\n{service['Service']}:")
+                lines.append(f"Region: {service['Region']}")
                 
                 if not service['Is Usage Based']:
-                    print(f"Instance Type: {service['Instance Type']}")
-                    print(f"Hourly Cost: ${service['Hourly Cost (USD)']}")
-                    print(f"Monthly Cost: ${service['Monthly Cost (USD)']}")
+                    lines.append(f"Instance Type: {service['Instance Type']}")
+                    lines.append(f"Hourly Cost: ${service['Hourly Cost (USD)']}")
+                    lines.append(f"Monthly Cost: ${service['Monthly Cost (USD)']}")
                     
                     # Print specifications if available
                     specs = service.get('Specifications', {})
                     if specs:
-                        print("Specifications:")
-                        for key, value in specs.items():
-                            print(f"  {key}: {value}")
+                        lines.append("Specifications:")
+                        lines.extend(f"  {key}: {value}" for key, value in specs.items())
                 else:
-                    print(f"Usage Type: {service['Usage Type']}")
-                    print("Pricing Components:")
-                    for component in service['Components']:
-                        print(f"  - {component}")
-                    print("Note: Cost depends on actual usage")
+                    lines.append(f"Usage Type: {service['Usage Type']}")
+                    lines.append("Pricing Components:")
+                    lines.extend(f"  - {component}" for component in service['Components'])
+                    lines.append("Note: Cost depends on actual usage")
                 
-                print("-" * 40)
+                lines.append("-" * 40)
         
-        print("\nSummary:")
-        print("-" * 60)
-        print(f"Total Hourly Cost: ${total_hourly_cost:.8f}")
-        print(f"Total Daily Cost: ${total_hourly_cost * 24:.8f}")
-        print(f"Total Monthly Cost: ${total_monthly_cost:.2f}")
-        print("\nNote: Usage-based services require actual usage data for accurate pricing.")
-        print(f"\nDetailed report saved to cost_report.json") 
\ No newline at end of file
+        lines.extend([
+            "\nSummary:",
+            "-" * 60,
+            f"Total Hourly Cost: ${total_hourly_cost:.8f}",
+            f"Total Daily Cost: ${total_hourly_cost * HOURS_PER_DAY:.8f}",
+            f"Total Monthly Cost: ${total_monthly_cost:.2f}",
+            "\nNote: Usage-based services require actual usage data for accurate pricing.",
+            "\nDetailed report saved to cost_report.json"
+        ])
+        sys.stdout.write("\n".join(lines) + "\n")
\ No newline at end of file
@@ -19,7 +19,7 @@ def main():
             logger.error("Failed to calculate costs")
             
     except Exception as e:
-        logger.error(f"Error during testing: {e}")
+        logger.error("Error during testing: %s", e)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,171 @@
+import json
+import os
+import shelve
+import tempfile
+import threading
+import time
+import unittest
+
+import aws_pricing_api
+from aws_pricing_api import (
+    AWSPricingAPI,
+    EMPTY_RESULT_CACHE_TTL,
+    PRICING_CACHE_TTL,
+)
+
+
+def _product(instance_type, price=None):
+    """Build a PriceList item; products without a price have no OnDemand terms."""
+    terms = {}
+    if price is not None:
+        terms = {'OnDemand': {'T': {'priceDimensions': {'D': {'pricePerUnit': {'USD': str(price)}}}}}}
+    return json.dumps({
+        'product': {'attributes': {'instanceType': instance_type, 'location': 'Asia Pacific (Mumbai)'}},
+        'terms': terms
+    })
+
+
+class StubPricingClient:
+    """Stands in for the boto3 Pricing client and records every get_products call."""
+
+    def __init__(self, price_list=None, delay=0.0):
+        self.price_list = [_product('t3.micro', 0.0104)] if price_list is None else price_list
+        self.delay = delay
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def get_products(self, **request):
+        with self.lock:
+            self.calls.append(request)
+        time.sleep(self.delay)
+        return {'PriceList': list(self.price_list)}
+
+
+class PricingCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.cache_file = os.path.join(self.tmp.name, 'pricing_cache.db')
+
+    def make_api(self, client, region='ap-south-1'):
+        api = AWSPricingAPI(region, cache_file=self.cache_file)
+        api._pricing_client = client
+        return api
+
+    def age_entries(self, api, seconds):
+        for key, (timestamp, price_list) in api.pricing_cache.items():
+            api.pricing_cache[key] = (timestamp - seconds, price_list)
+
+    def test_fresh_result_is_served_from_cache(self):
+        client = StubPricingClient()
+        api = self.make_api(client)
+
+        first = api.calculate_service_cost('AmazonEC2', 't3.micro')
+        second = api.calculate_service_cost('AmazonEC2', 't3.micro')
+
+        self.assertEqual(len(client.calls), 1)
+        self.assertEqual(first['hourly_cost'], second['hourly_cost'])
+
+    def test_result_is_fetched_again_after_ttl(self):
+        client = StubPricingClient()
+        api = self.make_api(client)
+
+        api.calculate_service_cost('AmazonEC2', 't3.micro')
+        self.age_entries(api, PRICING_CACHE_TTL)
+        api.calculate_service_cost('AmazonEC2', 't3.micro')
+
+        self.assertEqual(len(client.calls), 2)
+
+    def test_empty_result_is_cached_for_shorter_ttl(self):
+        client = StubPricingClient(price_list=[])
+        api = self.make_api(client)
+
+        api.calculate_service_cost('AmazonEC2', 't3.micro')
+        api.calculate_service_cost('AmazonEC2', 't3.micro')
+        self.assertEqual(len(client.calls), 1)
+
+        self.age_entries(api, EMPTY_RESULT_CACHE_TTL)
+        api.calculate_service_cost('AmazonEC2', 't3.micro')
+        self.assertEqual(len(client.calls), 2)
+
+    def test_unpriced_first_product_is_skipped(self):
+        client = StubPricingClient(price_list=[_product('t3.micro'), _product('t3.micro', 0.0104)])
+        api = self.make_api(client)
+
+        cost = api.calculate_service_cost('AmazonEC2', 't3.micro')
+
+        self.assertEqual(cost['hourly_cost'], 0.0104)
+        self.assertGreater(client.calls[0]['MaxResults'], 1)
+
+    def test_cache_file_is_reused_by_new_instance(self):
+        self.make_api(StubPricingClient()).calculate_service_cost('AmazonEC2', 't3.micro')
+
+        client = StubPricingClient()
+        self.make_api(client).calculate_service_cost('AmazonEC2', 't3.micro')
+
+        self.assertEqual(client.calls, [])
+
+    def test_corrupt_cache_file_falls_back_to_api(self):
+        self.make_api(StubPricingClient()).calculate_service_cost('AmazonEC2', 't3.micro')
+        for name in os.listdir(self.tmp.name):
+            with open(os.path.join(self.tmp.name, name), 'wb') as f:
+                f.write(os.urandom(64))
+
+        client = StubPricingClient()
+        cost = self.make_api(client).calculate_service_cost('AmazonEC2', 't3.micro')
+
+        self.assertEqual(len(client.calls), 1)
+        self.assertEqual(cost['hourly_cost'], 0.0104)
+
+    def test_load_prunes_expired_entries_and_keeps_other_locations_on_disk(self):
+        self.make_api(StubPricingClient()).calculate_service_cost('AmazonEC2', 't3.micro')
+        self.make_api(StubPricingClient(), 'us-east-1').calculate_service_cost('AmazonEC2', 't3.micro')
+        with shelve.open(self.cache_file) as db:
+            db['expired'] = (time.time() - PRICING_CACHE_TTL, ['stale'])
+
+        api = self.make_api(StubPricingClient())
+        api._load_cache_file()
+
+        with shelve.open(self.cache_file, flag='r') as db:
+            self.assertNotIn('expired', db)
+            self.assertEqual(len(db), 2)
+        self.assertEqual(len(api.pricing_cache), 1)
+
+    def test_clear_only_drops_own_location(self):
+        mumbai = self.make_api(StubPricingClient())
+        mumbai.calculate_service_cost('AmazonEC2', 't3.micro')
+        self.make_api(StubPricingClient(), 'us-east-1').calculate_service_cost('AmazonEC2', 't3.micro')
+
+        mumbai.clear_pricing_cache()
+
+        us_client = StubPricingClient()
+        self.make_api(us_client, 'us-east-1').calculate_service_cost('AmazonEC2', 't3.micro')
+        mumbai_client = StubPricingClient()
+        self.make_api(mumbai_client).calculate_service_cost('AmazonEC2', 't3.micro')
+        self.assertEqual(us_client.calls, [])
+        self.assertEqual(len(mumbai_client.calls), 1)
+
+    def test_concurrent_first_lookups_load_cache_file_once(self):
+        self.make_api(StubPricingClient()).calculate_service_cost('AmazonEC2', 't3.micro')
+
+        client = StubPricingClient(delay=0.01)
+        api = self.make_api(client)
+        costs = api.calculate_service_costs([('AmazonEC2', 't3.micro')] * 16)
+
+        self.assertEqual(client.calls, [])
+        self.assertTrue(all(cost['hourly_cost'] == 0.0104 for cost in costs))
+
+
+class SharedApiTest(unittest.TestCase):
+
+    def test_region_spellings_share_one_instance(self):
+        default = aws_pricing_api.get_shared_api()
+        self.assertIs(default, aws_pricing_api.get_shared_api('ap-south-1'))
+        self.assertIs(default, aws_pricing_api.get_shared_api(region='ap-south-1'))
+        self.assertIs(default, aws_pricing_api.get_shared_api('Asia Pacific (Mumbai)'))
+        self.assertIsNot(default, aws_pricing_api.get_shared_api('us-east-1'))
+
+
+if __name__ == '__main__':
+    unittest.main()